@@ -1,26 +1,39 @@
 # main.py - FastAPI Backend Server
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response, Depends
+from fastapi.responses import RedirectResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from pydantic import BaseModel, HttpUrl, AnyUrl, UrlConstraints, TypeAdapter, AfterValidator
+from typing import Optional, List, Tuple, Annotated
 import sqlite3
 import string
 import random
 import datetime
-from urllib.parse import urlparse
+import time
 import qrcode
+from PIL import Image
 import io
 import base64
+import hashlib
 import uvicorn
 import os
-from contextlib import contextmanager
+import queue
+import asyncio
+import logging
+import multiprocessing
+from contextlib import contextmanager, suppress
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="URL Shortener API",
     description="A powerful URL shortener with analytics",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -35,10 +48,43 @@ app.add_middleware(
 # Configuration
 BASE_URL = os.getenv('BASE_URL', 'http://localhost:5001')
 DATABASE_FILE = 'urlshortener.db'
+BASE62_ALPHABET = string.digits + string.ascii_letters
+# Paths served by the app itself, which /{short_code} would never reach
+RESERVED_CODES = {'api', 'docs', 'redoc', 'openapi.json'}
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+
+# Process-wide pool of open SQLite connections, filled on startup
+_POOL: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=DB_POOL_SIZE)
+
+# Clicks waiting to be written to the analytics table in batches; the queue
+# is created on startup so it belongs to the running event loop
+ANALYTICS_BATCH_SIZE = 500
+ANALYTICS_FLUSH_INTERVAL = 0.1  # seconds
+_ANALYTICS_Q: "Optional[asyncio.Queue[tuple]]" = None
+_analytics_task: Optional[asyncio.Task] = None
+
+# LRU cache of active short codes -> ((original_url, expires_ts), cached_at).
+# Each worker process has its own copy, so entries expire after a short TTL
+# to pick up links deactivated through another worker.
+URL_CACHE_SIZE = 10000
+URL_CACHE_TTL = float(os.getenv('URL_CACHE_TTL', '30'))  # seconds
+_URL_CACHE: "OrderedDict[str, Tuple[Tuple[str, Optional[int]], float]]" = OrderedDict()
+
+# Process pool for CPU-bound QR code generation, created on startup
+QR_POOL_SIZE = int(os.getenv('QR_POOL_SIZE', '2'))
+_QR_POOL: Optional[ProcessPoolExecutor] = None
+
+# URL validation: any http(s) URL, without HttpUrl's 2083 character cap
+_WEB_URL = TypeAdapter(Annotated[AnyUrl, UrlConstraints(allowed_schemes=['http', 'https'], max_length=65536)])
+
+def validate_web_url(url: str) -> str:
+    """Check that url is an http(s) URL, keeping it exactly as submitted"""
+    _WEB_URL.validate_python(url)
+    return url
 
 # Pydantic Models
 class URLCreate(BaseModel):
-    original_url: str
+    original_url: Annotated[str, AfterValidator(validate_web_url)]
     custom_code: Optional[str] = None
     expires_in_days: Optional[int] = None
 
@@ -65,80 +111,150 @@ class AnalyticsResponse(BaseModel):
     click_data: List[dict]
 
 # Database functions
+def _configure(conn: sqlite3.Connection):
+    """Apply per-connection PRAGMA tuning"""
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -64000")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    # Wait for other writers (e.g. other uvicorn workers) instead of failing
+    conn.execute("PRAGMA busy_timeout = 5000")
+
+def _open_connection() -> sqlite3.Connection:
+    """Open a new SQLite connection suitable for pooling"""
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    _configure(conn)
+    return conn
+
+def init_db_pool():
+    """Fill the connection pool with pre-opened connections"""
+    while not _POOL.full():
+        _POOL.put_nowait(_open_connection())
+
+def close_db_pool():
+    """Drain the connection pool and close every connection"""
+    while True:
+        try:
+            conn = _POOL.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+
 @contextmanager
 def get_db_connection():
-    """Get database connection with context manager"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
+    """Borrow a pooled database connection with context manager"""
+    conn = _POOL.get()
     try:
         yield conn
     finally:
-        conn.close()
+        _POOL.put(conn)
 
 def init_database():
     """Initialize the SQLite database with required tables"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        # URLs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS urls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                original_url TEXT NOT NULL,
-                short_code TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                clicks INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1,
-                expires_at TIMESTAMP NULL
-            )
-        ''')
-        
-        # Analytics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                short_code TEXT NOT NULL,
-                ip_address TEXT,
-                user_agent TEXT,
-                referrer TEXT,
-                clicked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (short_code) REFERENCES urls (short_code)
-            )
-        ''')
-        
-        # Create indexes for better performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_short_code ON urls (short_code)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_short_code ON analytics (short_code)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_clicked_at ON analytics (clicked_at)')
+
+        # WAL mode is persistent in the database file, so set it once here
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+        # One transaction so concurrent workers starting up see the schema
+        # (and its migrations) either entirely or not at all
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # URLs table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS urls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    original_url TEXT NOT NULL,
+                    short_code TEXT UNIQUE NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    clicks INTEGER DEFAULT 0,
+                    is_active BOOLEAN DEFAULT 1,
+                    expires_at TIMESTAMP NULL,
+                    qr_code TEXT NULL,
+                    expires_ts INTEGER NULL,
+                    qr_url TEXT NULL
+                )
+            ''')
+            
+            # Add columns introduced after the original schema
+            cursor.execute("PRAGMA table_info(urls)")
+            url_columns = {row['name'] for row in cursor.fetchall()}
+            if 'qr_code' not in url_columns:
+                cursor.execute("ALTER TABLE urls ADD COLUMN qr_code TEXT NULL")
+            if 'expires_ts' not in url_columns:
+                # Unix timestamp twin of expires_at (stored as local time)
+                cursor.execute("ALTER TABLE urls ADD COLUMN expires_ts INTEGER NULL")
+                cursor.execute('''
+                    UPDATE urls SET expires_ts = CAST(strftime('%s', expires_at, 'utc') AS INTEGER)
+                    WHERE expires_at IS NOT NULL
+                ''')
+            if 'qr_url' not in url_columns:
+                # Short URL the stored QR code encodes
+                cursor.execute("ALTER TABLE urls ADD COLUMN qr_url TEXT NULL")
+            
+            # Analytics table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analytics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    short_code TEXT NOT NULL,
+                    ip_address TEXT,
+                    user_agent TEXT,
+                    referrer TEXT,
+                    clicked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (short_code) REFERENCES urls (short_code)
+                )
+            ''')
+            
+            # Create indexes for better performance
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_short_code ON urls (short_code)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_original_url ON urls (original_url) WHERE is_active = 1')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_clicked_at ON analytics (clicked_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_day ON analytics (DATE(clicked_at))')
+            # Covers per-link lookups ordered by time; supersedes the short_code-only index
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_code_time ON analytics (short_code, clicked_at DESC)')
+            cursor.execute('DROP INDEX IF EXISTS idx_analytics_short_code')
+        except BaseException:
+            conn.rollback()
+            raise
         
         conn.commit()
 
 # Utility functions
 def generate_short_code(length: int = 6) -> str:
     """Generate a random short code"""
-    characters = string.ascii_letters + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
+    return ''.join(random.choices(BASE62_ALPHABET, k=length))
 
-def is_valid_url(url: str) -> bool:
-    """Validate URL format"""
-    try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except:
-        return False
+def encode_base62(number: int) -> str:
+    """Encode a non-negative integer as a base62 short code"""
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+    return ''.join(reversed(digits))
 
 def generate_qr_code(url: str) -> str:
     """Generate QR code for URL and return as base64 string"""
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    # A fixed mask pattern skips the costly best-mask search
+    qr = qrcode.QRCode(version=1, box_size=10, border=5, mask_pattern=0)
     qr.add_data(url)
     qr.make(fit=True)
     
-    img = qr.make_image(fill_color="black", back_color="white")
+    # Paint the module matrix (border included) at one pixel per module and
+    # scale it up, rather than drawing every module as a rectangle
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    img = Image.new('1', (size, size))
+    img.putdata([0 if module else 255 for row in matrix for module in row])
+    img = img.resize((size * qr.box_size, size * qr.box_size), Image.NEAREST)
+    
     buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
+    img.save(buffer, format='PNG', optimize=False)
     
-    qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+    qr_base64 = base64.b64encode(buffer.getbuffer()).decode('ascii')
     return f"data:image/png;base64,{qr_base64}"
 
 def get_client_ip(request: Request) -> str:
@@ -148,186 +264,235 @@ def get_client_ip(request: Request) -> str:
         return forwarded.split(",")[0].strip()
     return request.client.host
 
-# API Routes
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    init_database()
+def cache_get_url(short_code: str) -> Optional[Tuple[str, Optional[int]]]:
+    """Look up a short code in the URL cache, marking it recently used"""
+    cached = _URL_CACHE.get(short_code)
+    if cached is None:
+        return None
+    entry, cached_at = cached
+    if time.monotonic() - cached_at > URL_CACHE_TTL:
+        del _URL_CACHE[short_code]
+        return None
+    _URL_CACHE.move_to_end(short_code)
+    return entry
 
-@app.get("/")
-async def root():
-    """Health check endpoint"""
-    return {"message": "URL Shortener API is running", "status": "healthy"}
+def cache_put_url(short_code: str, entry: Tuple[str, Optional[int]]):
+    """Store a short code in the URL cache, evicting the least recently used"""
+    _URL_CACHE[short_code] = (entry, time.monotonic())
+    _URL_CACHE.move_to_end(short_code)
+    if len(_URL_CACHE) > URL_CACHE_SIZE:
+        _URL_CACHE.popitem(last=False)
 
-@app.post("/api/shorten", response_model=URLResponse)
-async def shorten_url(url_data: URLCreate, request: Request):
-    """Shorten a long URL"""
-    
-    # Validate URL
-    if not is_valid_url(url_data.original_url):
-        raise HTTPException(status_code=400, detail="Invalid URL format")
-    
+# Database operations (blocking; routes run these via asyncio.to_thread)
+def find_or_create_url(url_data: URLCreate) -> dict:
+    """Return the active URL row for url_data, inserting it if needed"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Check if URL already exists
-        cursor.execute(
-            "SELECT * FROM urls WHERE original_url = ? AND is_active = 1",
-            (url_data.original_url,)
-        )
-        existing_url = cursor.fetchone()
-        
-        if existing_url:
-            # Return existing short URL
-            short_url = f"{BASE_URL}/{existing_url['short_code']}"
-            qr_code = generate_qr_code(short_url)
-            
-            return URLResponse(
-                id=existing_url['id'],
-                original_url=existing_url['original_url'],
-                short_code=existing_url['short_code'],
-                short_url=short_url,
-                created_at=existing_url['created_at'],
-                clicks=existing_url['clicks'],
-                qr_code=qr_code
-            )
-        
-        # Generate unique short code
-        short_code = url_data.custom_code
-        if not short_code:
-            while True:
-                short_code = generate_short_code()
-                cursor.execute("SELECT id FROM urls WHERE short_code = ?", (short_code,))
-                if not cursor.fetchone():
-                    break
-        else:
-            # Check if custom code already exists
-            cursor.execute("SELECT id FROM urls WHERE short_code = ?", (short_code,))
-            if cursor.fetchone():
-                raise HTTPException(status_code=400, detail="Custom code already exists")
-        
         # Calculate expiration date
         expires_at = None
+        expires_ts = None
         if url_data.expires_in_days:
             expires_at = datetime.datetime.now() + datetime.timedelta(days=url_data.expires_in_days)
+            expires_ts = int(expires_at.timestamp())
+        
+        # Take the write lock before the existence checks so that concurrent
+        # requests can't both pass them and then insert the same URL or code
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Check if URL already exists
+            cursor.execute('''
+                SELECT id, original_url, short_code, created_at, clicks, qr_code, qr_url
+                FROM urls
+                WHERE original_url = ? AND is_active = 1
+                LIMIT 1
+            ''', (url_data.original_url,))
+            existing_url = cursor.fetchone()
+            
+            if existing_url:
+                conn.commit()
+                return {
+                    "id": existing_url['id'],
+                    "original_url": existing_url['original_url'],
+                    "short_code": existing_url['short_code'],
+                    "created_at": existing_url['created_at'],
+                    "clicks": existing_url['clicks'],
+                    "qr_code": existing_url['qr_code'],
+                    "qr_url": existing_url['qr_url']
+                }
+            
+            short_code = url_data.custom_code
+            if short_code:
+                if short_code in RESERVED_CODES:
+                    raise HTTPException(status_code=400, detail="Custom code is reserved")
+                # Check if custom code already exists
+                cursor.execute("SELECT id FROM urls WHERE short_code = ?", (short_code,))
+                if cursor.fetchone():
+                    raise HTTPException(status_code=400, detail="Custom code already exists")
+            
+            # Insert new URL; generated codes use a placeholder until the id is known
+            cursor.execute('''
+                INSERT INTO urls (original_url, short_code, expires_at, expires_ts)
+                VALUES (?, ?, ?, ?)
+            ''', (url_data.original_url, short_code or '', expires_at, expires_ts))
+            
+            url_id = cursor.lastrowid
+            
+            if not short_code:
+                short_code = encode_base62(url_id)
+                code_taken = short_code in RESERVED_CODES
+                if not code_taken:
+                    try:
+                        cursor.execute("UPDATE urls SET short_code = ? WHERE id = ?", (short_code, url_id))
+                    except sqlite3.IntegrityError:
+                        # Already used by a custom or older random code
+                        code_taken = True
+                if code_taken:
+                    while True:
+                        short_code = generate_short_code()
+                        cursor.execute("SELECT id FROM urls WHERE short_code = ?", (short_code,))
+                        if not cursor.fetchone():
+                            break
+                    cursor.execute("UPDATE urls SET short_code = ? WHERE id = ?", (short_code, url_id))
+        except BaseException:
+            conn.rollback()
+            raise
         
-        # Insert new URL
-        cursor.execute('''
-            INSERT INTO urls (original_url, short_code, expires_at)
-            VALUES (?, ?, ?)
-        ''', (url_data.original_url, short_code, expires_at))
-        
-        url_id = cursor.lastrowid
         conn.commit()
         
-        # Generate response
-        short_url = f"{BASE_URL}/{short_code}"
-        qr_code = generate_qr_code(short_url)
-        
-        return URLResponse(
-            id=url_id,
-            original_url=url_data.original_url,
-            short_code=short_code,
-            short_url=short_url,
-            created_at=datetime.datetime.now().isoformat(),
-            clicks=0,
-            qr_code=qr_code
+        return {
+            "id": url_id,
+            "original_url": url_data.original_url,
+            "short_code": short_code,
+            "created_at": datetime.datetime.now().isoformat(),
+            "clicks": 0,
+            "qr_code": None,
+            "qr_url": None
+        }
+
+def store_qr_code(short_code: str, qr_code: str, qr_url: str):
+    """Save the generated QR code for a short URL along with the URL it encodes"""
+    with get_db_connection() as conn:
+        conn.execute(
+            "UPDATE urls SET qr_code = ?, qr_url = ? WHERE short_code = ?",
+            (qr_code, qr_url, short_code)
         )
+        conn.commit()
 
-@app.get("/{short_code}")
-async def redirect_url(short_code: str, request: Request):
-    """Redirect to original URL and track analytics"""
-    
+def lookup_url(short_code: str) -> Tuple[str, Optional[int]]:
+    """Return (original_url, expires_ts) for an active short code"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        # Get URL data
+
         cursor.execute('''
-            SELECT * FROM urls 
+            SELECT original_url, expires_ts FROM urls
             WHERE short_code = ? AND is_active = 1
         ''', (short_code,))
-        
+
         url_data = cursor.fetchone()
-        
+
         if not url_data:
             raise HTTPException(status_code=404, detail="Short URL not found")
-        
-        # Check if URL has expired
-        if url_data['expires_at']:
-            expires_at = datetime.datetime.fromisoformat(url_data['expires_at'])
-            if datetime.datetime.now() > expires_at:
-                raise HTTPException(status_code=410, detail="Short URL has expired")
-        
-        # Log analytics
-        ip_address = get_client_ip(request)
-        user_agent = request.headers.get("User-Agent", "")
-        referrer = request.headers.get("Referer", "")
-        
-        cursor.execute('''
-            INSERT INTO analytics (short_code, ip_address, user_agent, referrer)
-            VALUES (?, ?, ?, ?)
-        ''', (short_code, ip_address, user_agent, referrer))
-        
-        # Update click count
-        cursor.execute('''
-            UPDATE urls SET clicks = clicks + 1 WHERE short_code = ?
-        ''', (short_code,))
-        
+
+        return url_data['original_url'], url_data['expires_ts']
+
+def write_analytics_batch(batch: List[tuple]):
+    """Insert a batch of queued clicks and bump click counts in a single transaction"""
+    click_counts = Counter(click[0] for click in batch)
+    with get_db_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany('''
+                INSERT INTO analytics (short_code, ip_address, user_agent, referrer, clicked_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch)
+            conn.executemany(
+                "UPDATE urls SET clicks = clicks + ? WHERE short_code = ?",
+                [(count, short_code) for short_code, count in click_counts.items()]
+            )
+        except BaseException:
+            conn.rollback()
+            raise
         conn.commit()
-        
-        return RedirectResponse(url=url_data['original_url'], status_code=302)
 
-@app.get("/api/analytics", response_model=AnalyticsResponse)
-async def get_analytics():
-    """Get overall analytics data"""
-    
+def drain_analytics_queue() -> List[tuple]:
+    """Take up to ANALYTICS_BATCH_SIZE queued clicks without waiting"""
+    batch = []
+    if _ANALYTICS_Q is None:
+        return batch
+    while len(batch) < ANALYTICS_BATCH_SIZE and not _ANALYTICS_Q.empty():
+        batch.append(_ANALYTICS_Q.get_nowait())
+    return batch
+
+async def flush_analytics():
+    """Background task writing queued clicks to the database in batches"""
+    while True:
+        batch = [await _ANALYTICS_Q.get()]
+        try:
+            # Give a burst of clicks a moment to accumulate into one batch
+            await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+        finally:
+            batch.extend(drain_analytics_queue())
+            try:
+                await asyncio.to_thread(write_analytics_batch, batch)
+            except Exception:
+                logger.exception("Failed to write %d analytics rows", len(batch))
+
+def load_analytics() -> AnalyticsResponse:
+    """Load overall analytics data"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Total links
-        cursor.execute("SELECT COUNT(*) as count FROM urls WHERE is_active = 1")
-        total_links = cursor.fetchone()['count']
-        
-        # Total clicks
-        cursor.execute("SELECT COUNT(*) as count FROM analytics")
-        total_clicks = cursor.fetchone()['count']
-        
-        # Today's clicks
-        today = datetime.date.today().isoformat()
+        # Total links, total clicks and today's clicks in one query
+        # (range bounds on today's clicks keep idx_clicked_at usable).
+        # clicked_at is stored in UTC, so day boundaries are UTC days too.
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        tomorrow = today + datetime.timedelta(days=1)
         cursor.execute('''
-            SELECT COUNT(*) as count FROM analytics 
-            WHERE DATE(clicked_at) = ?
-        ''', (today,))
-        today_clicks = cursor.fetchone()['count']
-        
-        # Click data for last 7 days
+            WITH
+                links AS (SELECT COUNT(*) as count FROM urls WHERE is_active = 1),
+                clicks AS (SELECT COUNT(*) as count FROM analytics),
+                today AS (
+                    SELECT COUNT(*) as count FROM analytics
+                    WHERE clicked_at >= ? AND clicked_at < ?
+                )
+            SELECT links.count as total_links,
+                   clicks.count as total_clicks,
+                   today.count as today_clicks
+            FROM links, clicks, today
+        ''', (today.isoformat(), tomorrow.isoformat()))
+        totals = cursor.fetchone()
+        
+        # Click data for last 7 days (matches idx_analytics_day, so rows
+        # come back already grouped by day)
+        week_ago = today - datetime.timedelta(days=7)
         cursor.execute('''
             SELECT DATE(clicked_at) as date, COUNT(*) as clicks
             FROM analytics
-            WHERE clicked_at >= date('now', '-7 days')
+            WHERE DATE(clicked_at) >= ?
             GROUP BY DATE(clicked_at)
             ORDER BY date
-        ''')
+        ''', (week_ago.isoformat(),))
         
         click_data = [{"date": row['date'], "clicks": row['clicks']} for row in cursor.fetchall()]
         
         return AnalyticsResponse(
-            total_links=total_links,
-            total_clicks=total_clicks,
-            today_clicks=today_clicks,
+            total_links=totals['total_links'],
+            total_clicks=totals['total_clicks'],
+            today_clicks=totals['today_clicks'],
             click_data=click_data
         )
 
-@app.get("/api/analytics/{short_code}")
-async def get_url_analytics(short_code: str):
-    """Get analytics for a specific short URL"""
-    
+def load_url_analytics(short_code: str) -> dict:
+    """Load analytics for a specific short URL"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
         # Get URL info
-        cursor.execute("SELECT * FROM urls WHERE short_code = ?", (short_code,))
+        cursor.execute(
+            "SELECT original_url, short_code, created_at, clicks FROM urls WHERE short_code = ?",
+            (short_code,)
+        )
         url_data = cursor.fetchone()
         
         if not url_data:
@@ -361,10 +526,8 @@ async def get_url_analytics(short_code: str):
             "clicks": clicks
         }
 
-@app.get("/api/links")
-async def get_all_links():
-    """Get all shortened links"""
-    
+def load_links() -> List[dict]:
+    """Load all active shortened links"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
@@ -387,12 +550,41 @@ async def get_all_links():
                 "clicks": row['clicks']
             })
         
-        return {"links": links}
+        return links
 
-@app.delete("/api/links/{short_code}")
-async def delete_link(short_code: str):
+def analytics_etag() -> str:
+    """Build an ETag that changes whenever the overall analytics change"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM urls WHERE is_active = 1) as links,
+                   (SELECT MAX(id) FROM analytics) as max_click_id
+        ''')
+        row = cursor.fetchone()
+        
+        # Today's count and the 7-day window also move at UTC midnight
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        fingerprint = f"{row['links']}:{row['max_click_id']}:{today.isoformat()}"
+        return f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+
+def links_etag() -> str:
+    """Build an ETag that changes whenever the active links listing changes"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*) as count, MAX(id) as max_id, TOTAL(clicks) as clicks
+            FROM urls
+            WHERE is_active = 1
+        ''')
+        row = cursor.fetchone()
+        
+        fingerprint = f"{row['count']}:{row['max_id']}:{row['clicks']}"
+        return f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+
+def deactivate_link(short_code: str):
     """Deactivate a shortened link"""
-    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
@@ -405,20 +597,149 @@ async def delete_link(short_code: str):
             raise HTTPException(status_code=404, detail="Short URL not found")
         
         conn.commit()
-        
-        return {"message": "Link deactivated successfully"}
+
+# API Routes
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize pools, database and background tasks on startup"""
+    global _ANALYTICS_Q, _analytics_task, _QR_POOL
+    init_db_pool()
+    init_database()
+    _ANALYTICS_Q = asyncio.Queue()
+    _analytics_task = asyncio.create_task(flush_analytics())
+    # Don't fork: by now this process runs threads holding pool and queue locks
+    _QR_POOL = ProcessPoolExecutor(
+        max_workers=QR_POOL_SIZE,
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending analytics and release pooled resources on shutdown"""
+    if _QR_POOL:
+        _QR_POOL.shutdown(wait=False, cancel_futures=True)
+    if _analytics_task:
+        _analytics_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _analytics_task
+    while batch := drain_analytics_queue():
+        write_analytics_batch(batch)
+    close_db_pool()
+
+@app.get("/")
+async def root():
+    """Health check endpoint"""
+    return {"message": "URL Shortener API is running", "status": "healthy"}
+
+@app.post("/api/shorten", response_model=URLResponse)
+async def shorten_url(url_data: URLCreate, request: Request):
+    """Shorten a long URL"""
+    
+    url_row = await asyncio.to_thread(find_or_create_url, url_data)
+    _URL_CACHE.pop(url_row['short_code'], None)
+    
+    # Generate response; the QR code is built once and stored with the URL,
+    # and rebuilt if it was made for a different short URL (e.g. BASE_URL changed)
+    short_url = f"{BASE_URL}/{url_row['short_code']}"
+    qr_code = url_row['qr_code']
+    if not qr_code or url_row['qr_url'] != short_url:
+        loop = asyncio.get_running_loop()
+        qr_code = await loop.run_in_executor(_QR_POOL, generate_qr_code, short_url)
+        await asyncio.to_thread(store_qr_code, url_row['short_code'], qr_code, short_url)
+    
+    return URLResponse(
+        id=url_row['id'],
+        original_url=url_row['original_url'],
+        short_code=url_row['short_code'],
+        short_url=short_url,
+        created_at=url_row['created_at'],
+        clicks=url_row['clicks'],
+        qr_code=qr_code
+    )
+
+@app.get("/{short_code}")
+async def redirect_url(short_code: str, request: Request):
+    """Redirect to original URL and track analytics"""
+    
+    ip_address = get_client_ip(request)
+    user_agent = request.headers.get("User-Agent", "")
+    referrer = request.headers.get("Referer", "")
+    
+    entry = cache_get_url(short_code)
+    if entry is None:
+        entry = await asyncio.to_thread(lookup_url, short_code)
+        cache_put_url(short_code, entry)
+    original_url, expires_ts = entry
+    
+    # Check if URL has expired
+    if expires_ts and time.time() > expires_ts:
+        raise HTTPException(status_code=410, detail="Short URL has expired")
+    
+    # Queue the click for the background analytics writer
+    clicked_at = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    _ANALYTICS_Q.put_nowait((short_code, ip_address, user_agent, referrer, clicked_at))
+    
+    return RedirectResponse(url=original_url, status_code=302)
+
+@app.get("/api/analytics", response_model=AnalyticsResponse)
+async def get_analytics(request: Request):
+    """Get overall analytics data"""
+    # Clients must revalidate every time, but an unchanged dashboard costs a 304
+    etag = await asyncio.to_thread(analytics_etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    analytics = await asyncio.to_thread(load_analytics)
+    return ORJSONResponse(content=analytics.model_dump(), headers=headers)
+
+@app.get("/api/analytics/{short_code}")
+async def get_url_analytics(short_code: str):
+    """Get analytics for a specific short URL"""
+    return await asyncio.to_thread(load_url_analytics, short_code)
+
+@app.get("/api/links")
+async def get_all_links(request: Request):
+    """Get all shortened links"""
+    etag = await asyncio.to_thread(links_etag)
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    links = await asyncio.to_thread(load_links)
+    return ORJSONResponse(content={"links": links}, headers={"ETag": etag})
+
+@app.delete("/api/links/{short_code}")
+async def delete_link(short_code: str):
+    """Deactivate a shortened link"""
+    await asyncio.to_thread(deactivate_link, short_code)
+    _URL_CACHE.pop(short_code, None)
+    return {"message": "Link deactivated successfully"}
 
 # Error handlers
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request: Request, exc: RequestValidationError):
+    # Keep the 400 contract for bad URLs now that pydantic validates them
+    if any(
+        error['loc'] == ('body', 'original_url') and error['type'].startswith('url_')
+        for error in exc.errors()
+    ):
+        return ORJSONResponse(
+            status_code=400,
+            content={"detail": "Invalid URL format"}
+        )
+    return await request_validation_exception_handler(request, exc)
+
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"error": "Endpoint not found"}
     )
 
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error"}
     )
@@ -434,6 +755,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=5001,
-        reload=True,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file